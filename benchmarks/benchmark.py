@@ -0,0 +1,144 @@
+#!/bin/python
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+# Times every stage of DuplicateFinder on synthetic libraries and checks keep/remove result against the result
+# known by the library generator. Runs locally, library is created to temporary directory.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from duplicate_search import Config, DuplicateFinder
+from duplicate_search.fileio import string_without_extension
+from duplicate_search.profiling import profiler
+from duplicate_search.scan import walk_recordings
+from generate_library import generate_library, file_size_factor
+
+benchmark_config = {
+    "skipped_titles": ["[.]Trash[/]"],
+    "files_searched": ["[.]ts[.]meta$"],
+    "file_size_factor": str(file_size_factor),
+    "use_empty_epg_description": "0",
+    "delete_duplicates": "1",
+    "include_subfolders": "1",
+    "print_duplicates": "1",
+    "verbose": "0",
+    "read_from_stdin": 0,
+    "process_string": "",
+    "log_write_enabled": "1",
+    "use_meta_index": "0",
+    "io_workers": "1"
+}
+
+
+class StageTimer:
+    """
+    Collects wall and CPU time of named stages
+    """
+    def __init__(self):
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        yield
+        self.stages.append((name, time.perf_counter() - wall, time.process_time() - cpu))
+
+
+def record_name(root, filename):
+    # Name relative to root without .ts.meta, same format as in generator result
+    return os.path.relpath(os.path.join(root, string_without_extension(filename)), root)
+
+
+def run_benchmark(work_dir, count, duplicate_rate, seed, config_overrides):
+    """
+    Create library and run all stages
+    :return: Tuple (StageTimer, list of differences to expected result)
+    """
+    root = os.path.join(work_dir, "movie")
+    timer = StageTimer()
+    with timer.stage("generate"):
+        expected = generate_library(root, count, duplicate_rate, seed=seed)
+
+    config_data = dict(benchmark_config)
+    config_data.update(config_overrides)
+    config = Config(config_data)
+    config.meta_index_filename = os.path.join(work_dir, "duplicate_meta_index.json")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        finder = DuplicateFinder(root, config)
+        # Listing and filtering are run together by the finder, here also separately
+        with timer.stage("listing"):
+            names = [name for name, entry in walk_recordings(root, config.include_subfolders)]
+        with timer.stage("filtering"):
+            finder.path_filter.select(names, [])
+        # Stages inside the search are taken from the profiler of the package
+        profiler.enabled = True
+        profiler.stages = []
+        with timer.stage("search"):
+            result = finder.find()
+        profiler.enabled = False
+        timer.stages.extend((" " + stage['stage'], stage['wall_s'], stage['cpu_s']) for stage in profiler.stages)
+        with timer.stage("removal"):
+            finder.remove_duplicates()
+        with timer.stage("log"):
+            finder.write_log()
+
+    differences = []
+    removed = sorted(record_name(root, f) for f in result.remove)
+    kept = sorted(record_name(root, f) for f in result.keep)
+    if removed != expected['removed']:
+        differences.append(f"removed differs: {len(removed)} records, expected {len(expected['removed'])}")
+    if kept != expected['kept']:
+        differences.append(f"kept differs: {len(kept)} records, expected {len(expected['kept'])}")
+    for name in expected['removed']:
+        if os.path.exists(os.path.join(root, name + ".ts")) or os.path.exists(os.path.join(root, name + ".ts.meta")):
+            differences.append(f"not removed from disk: {name}")
+            break
+    for name in expected['kept']:
+        if not os.path.exists(os.path.join(root, name + ".ts.meta")):
+            differences.append(f"kept record missing from disk: {name}")
+            break
+    return timer, differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage by stage benchmark of duplicate search")
+    parser.add_argument("-n", "--count", help="Number of recordings, can be given several times", type=int,
+                        action="append")
+    parser.add_argument("-r", "--duplicate_rate", help="Part of recordings that are copies", type=float, default=0.3)
+    parser.add_argument("--seed", help="Random seed of library", type=int, default=1)
+    parser.add_argument("-c", "--config", help="Json object of config values to override, e.g. '{\"io_workers\": \"4\"}'",
+                        default="{}")
+    parser.add_argument("-o", "--output", help="Write results to this json file")
+    parser.add_argument("--keep", help="Keep created libraries", action="store_true")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for count in args.count or [1000]:
+        work_dir = tempfile.mkdtemp(prefix=f"duplicate_benchmark_{count}_")
+        try:
+            timer, differences = run_benchmark(work_dir, count, args.duplicate_rate, args.seed, json.loads(args.config))
+        finally:
+            if not args.keep:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"\n{count} recordings" + (f", library in {work_dir}" if args.keep else ""))
+        print(f"{'stage':20} {'wall s':>10} {'cpu s':>10}")
+        for name, wall, cpu in timer.stages:
+            print(f"{name:20} {wall:10.3f} {cpu:10.3f}")
+        print("Result matches expected" if not differences else "\n".join(differences))
+        failed = failed or bool(differences)
+        results.append({'count': count, 'stages': [{'stage': name, 'wall': wall, 'cpu': cpu}
+                                                   for name, wall, cpu in timer.stages],
+                        'differences': differences})
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,136 @@
+#!/bin/python
+
+import os
+import json
+import random
+import datetime
+import argparse
+
+# Synthetic recording library for benchmarks. Creates .ts.meta files named like Enigma2 does and sparse .ts files
+# so even large libraries take little disk space. Expected keep/remove result is computed while files are created.
+
+channels = ["Yle TV1", "Yle TV2", "MTV3", "Nelonen", "Sub", "Yle Teema Fem", "Jim", "TV5", "Hero", "Frii"]
+words = ["sarja", "jakso", "elokuva", "uutiset", "dokumentti", "luonto", "historia", "matka", "kokki", "tarina",
+         "kaupunki", "meri", "talvi", "kesä", "perhe", "rikos", "tutkija", "laulu", "urheilu", "tiede"]
+sibling_extensions = [".ts.ap", ".ts.sc", ".ts.cuts", ".eit"]
+file_size_factor = 0.90     # Same value is written to benchmark configuration
+
+
+def keeper_position(sizes):
+    """
+    Position of kept copy when copies are in index order. Same rule as in DuplicateFinder.
+    :param sizes: .ts sizes in index order
+    :return: Index of kept copy in sizes
+    """
+    max_value = max(sizes)
+    max_inx = len(sizes) - 1 - sizes[::-1].index(max_value)
+    if max_inx != len(sizes)-1 and max_value*file_size_factor > sizes[-1]:
+        return max_inx
+    return len(sizes) - 1
+
+
+def generate_library(root, count, duplicate_rate=0.3, folders=4, trash_rate=0.02, empty_description_rate=0.03,
+                     seed=1):
+    """
+    Create recordings below root
+    :param root: Recording directory, created when missing
+    :param count: Number of recordings
+    :param duplicate_rate: Part of recordings that are copies of earlier programme
+    :param folders: Number of subfolders, every second one has a nested folder
+    :param trash_rate: Part of recordings placed to .Trash
+    :param empty_description_rate: Part of programmes without description. These are never duplicates.
+    :param seed: Random seed, same seed gives same library
+    :return: Dict with lists 'removed' and 'kept' of record names relative to root without .ts.meta
+    """
+    generator = random.Random(seed)
+    folder_names = [""]
+    for i in range(folders):
+        folder_names.append(f"folder{i}")
+        if i % 2 == 1:
+            folder_names.append(f"folder{i}/nested")
+    for folder in folder_names + [".Trash"]:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    start_time = datetime.datetime(2020, 1, 1, 6, 0)
+    programmes = []
+    copies = {}
+    for i in range(count):
+        if programmes and generator.random() < duplicate_rate:
+            programme = generator.randrange(len(programmes))
+        else:
+            programme = len(programmes)
+            title = " ".join(generator.choice(words) for j in range(2)).capitalize() + f" {programme}"
+            if generator.random() < empty_description_rate:
+                description = ""
+            else:
+                description = " ".join(generator.choice(words) for j in range(12)).capitalize() + "."
+            # Copies are placed to one folder or spread to all folders
+            programmes.append((title, description, generator.random() < 0.5, generator.choice(folder_names)))
+        title, description, same_folder, home_folder = programmes[programme]
+        if generator.random() < trash_rate:
+            folder = ".Trash"
+        elif same_folder:
+            folder = home_folder
+        else:
+            folder = generator.choice(folder_names)
+        # Running start time keeps names unique
+        date = (start_time + datetime.timedelta(minutes=37 * i)).strftime("%Y%m%d %H%M")
+        name = os.path.join(folder, f"{date} - {generator.choice(channels)} - {title}")
+        copies.setdefault(programme, []).append(name)
+
+    removed = []
+    kept = []
+    for programme, names in copies.items():
+        title, description, same_folder, home_folder = programmes[programme]
+        names = [name for name in names if not name.startswith(".Trash")]
+        base_size = generator.randrange(200, 4000) * 1024 * 1024
+        if same_folder:
+            # Sizes close to each other, kept copy depends on order of names
+            sizes = [base_size - generator.randrange(0, base_size // 8) // 188 * 188 for name in names]
+        else:
+            # One copy clearly biggest so kept copy does not depend on order of names
+            sizes = [base_size // 2 + generator.randrange(0, base_size // 4) // 188 * 188 for name in names]
+            if sizes:
+                sizes[generator.randrange(len(sizes))] = base_size
+        order = sorted(range(len(names)), key=lambda inx: names[inx])
+        if len(names) > 1 and description != "":
+            keep = order[keeper_position([sizes[inx] for inx in order])]
+        else:
+            keep = None
+        for inx, name in enumerate(names):
+            if keep is None or inx == keep:
+                kept.append(name)
+            else:
+                removed.append(name)
+            _write_recording(root, name, title, description, sizes[inx], generator)
+        for name in copies[programme]:
+            if name.startswith(".Trash"):
+                _write_recording(root, name, title, description, base_size, generator)
+    return {'removed': sorted(removed), 'kept': sorted(kept)}
+
+
+def _write_recording(root, name, title, description, size, generator):
+    path = os.path.join(root, name)
+    with open(path + ".ts.meta", "w") as f:
+        f.write(f"1:0:19:1234:5:70:FFFF0000:0:0:0:\n{title}\n{description}\n1704103200\n\n{size // 2000}\n{size}\n")
+    with open(path + ".ts", "wb") as f:
+        f.truncate(size)
+    for extension in sibling_extensions:
+        if generator.random() < 0.5:
+            open(path + extension, "w").close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create synthetic recording library with known duplicates")
+    parser.add_argument("directory", help="Recording directory to create")
+    parser.add_argument("-n", "--count", help="Number of recordings", type=int, default=1000)
+    parser.add_argument("-r", "--duplicate_rate", help="Part of recordings that are copies", type=float, default=0.3)
+    parser.add_argument("-f", "--folders", help="Number of subfolders", type=int, default=4)
+    parser.add_argument("--seed", help="Random seed", type=int, default=1)
+    parser.add_argument("-m", "--manifest", help="Write expected keep/remove result to this json file")
+    args = parser.parse_args()
+    result = generate_library(args.directory, args.count, args.duplicate_rate, args.folders, seed=args.seed)
+    print(f"Created {args.count} recordings, {len(result['removed'])} expected to be removed")
+    if args.manifest:
+        with open(args.manifest, "w") as fp:
+            json.dump(result, fp, indent=2)
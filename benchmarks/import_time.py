@@ -0,0 +1,61 @@
+#!/bin/python
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Measures import time of duplicate_search package with python -X importtime and checks that modules needed only
+# by some options are not imported with the package. Time is compared to bare interpreter startup.
+
+package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported only when the option using them is selected
+lazy_modules = ['argparse', 'csv', 'subprocess', 'hashlib', 'mmap', 'concurrent', 'unicodedata', 'zlib', 'random']
+# Targets of package import, time added to interpreter startup
+import_target_ms = 10
+
+
+def import_time_us(statement):
+    """
+    Run statement in new interpreter with -X importtime
+    :param statement: Python code to run
+    :return: Tuple (sum of cumulative import times of top level imports in microseconds, set of imported modules)
+    """
+    # Bytecode cache is written and used as with installed package, the best run does not include compiling
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=package_root, env=env,
+                             capture_output=True, text=True, check=True)
+    total = 0
+    modules = set()
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.add(name.strip().split(".")[0])
+        # Top level imports are not indented, their cumulative time includes nested imports
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+    return total, modules
+
+
+def best_of(statement, repeat):
+    results = [import_time_us(statement) for i in range(repeat)]
+    return min(total for total, modules in results), results[0][1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time of duplicate_search package")
+    parser.add_argument("-r", "--repeat", help="Number of runs, best is reported", type=int, default=5)
+    args = parser.parse_args()
+
+    startup_us, startup_modules = best_of("pass", args.repeat)
+    package_us, package_modules = best_of("import duplicate_search", args.repeat)
+    added_ms = (package_us - startup_us) / 1000
+    print(f"interpreter startup imports {startup_us / 1000:8.2f} ms")
+    print(f"import duplicate_search     {package_us / 1000:8.2f} ms")
+    print(f"added by package            {added_ms:8.2f} ms, target {import_target_ms} ms")
+    eager = sorted(name for name in lazy_modules if name in package_modules and name not in startup_modules)
+    if eager:
+        print(f"Imported with package, should be lazy: {', '.join(eager)}")
+    sys.exit(1 if eager or added_ms > import_target_ms else 0)
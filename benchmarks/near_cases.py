@@ -0,0 +1,44 @@
+#!/bin/python
+
+import os
+import sys
+
+# Checks near duplicate search with known pairs of EPG texts. Reruns with changed tags must be grouped,
+# numbered episodes with same generic description must stay apart.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from duplicate_search.near import NearDuplicateIndex  # noqa: E402
+
+generic_description = "Jännittävä kotimainen draamasarja perheestä, joka muuttaa maalle."
+# (line2, line3) of two records and whether they are near duplicates
+near_cases = [
+    (("Sarja (R)", generic_description), ("Sarja", generic_description), True),
+    (("Sarja [HD]", generic_description), ("Sarja (U)", generic_description + " "), True),
+    (("Elokuva (Yle Teema)", "Ohjaaja kertoo tarinan."), ("elokuva", "Ohjaaja  kertoo tarinan"), True),
+    (("Elokuva (Yle TV1)", "Ohjaaja kertoo tarinan."), ("Elokuva (Yle TV2)", "Ohjaaja kertoo tarinan."), True),
+    (("Elokuva (MTV3)", "Ohjaaja kertoo tarinan."), ("Elokuva", "Ohjaaja kertoo tarinan."), True),
+    (("Elokuva (R)", "Ohjaaja kertoo tarinan."), ("Elokuva (TV5)", "Ohjaaja kertoo tarinan."), True),
+    (("Sarja (2/8) (Yle TV1)", generic_description), ("Sarja (2/8)", generic_description), True),
+    (("Sarja (3/8)", generic_description), ("Sarja (4/8)", generic_description), False),
+    (("Sarja", "Osa 3. " + generic_description), ("Sarja", "Osa 4. " + generic_description), False),
+    (("Sarja", "Kausi 2, jakso 3. " + generic_description), ("Sarja", "Kausi 2, jakso 13. " + generic_description), False),
+    (("Sarja (osa 3) [HD]", generic_description), ("Sarja (osa 4)", generic_description), False),
+    (("Sarja S01E03", generic_description), ("Sarja S01E04", generic_description), False),
+]
+
+
+def is_grouped(record_a, record_b):
+    index = NearDuplicateIndex()
+    index.add(0, *record_a)
+    index.add(1, *record_b)
+    return index.duplicate_groups() == [[0, 1]]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for record_a, record_b, expected in near_cases:
+        if is_grouped(record_a, record_b) != expected:
+            failed += 1
+            print(f"{'Not grouped' if expected else 'Grouped'}: {record_a} and {record_b}")
+    print(f"{len(near_cases) - failed} of {len(near_cases)} near duplicate cases ok")
+    sys.exit(1 if failed else 0)
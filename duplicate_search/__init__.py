@@ -0,0 +1,7 @@
+# Duplicate search of Enigma2 recordings. Modules needed only by some options are imported when used,
+# so importing the package is fast. Command line tool is in duplicate_search.cli.
+from .errors import DuplicateSearchError, ConfigError
+from .config import Config
+from .finder import DuplicateFinder, SearchResult
+
+__all__ = ['Config', 'DuplicateFinder', 'SearchResult', 'DuplicateSearchError', 'ConfigError']
@@ -0,0 +1,121 @@
+import sys
+import argparse
+
+from .config import Config, default_config_name
+from .errors import DuplicateSearchError
+from .fileio import string_without_extension
+from .finder import DuplicateFinder
+from .profiling import profiler
+
+
+def build_parser():
+    # Requires movie directory by default, mandatory argument
+    # Target is that command line argument overrides config_file settings.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="Directory for recordings. The directory contains .ts and .ts.meta files. Default json configuration is stored to there also. "
+                                          "Several directories can be given, duplicates are then searched across all of them.", type=str, nargs='+')
+    parser.add_argument("-config_file", help="Full path and file name for configuration file.", default=".")
+    parser.add_argument("-p", "--print_duplicates", help="Print only record names to be deleted. On error there could be other print outs.")
+    parser.add_argument("-v", "--verbose", help="Give processing information, debugging mode. Adds extra prints for print_duplicates also",
+                        action='store_true')
+    parser.add_argument("-d", "--delete_duplicates", help="Show only duplicates with 0. Delete with 1. Overrides config_file setting.")
+    parser.add_argument("-l", "--log_write_enabled", help="Set log writing status, 0 or 1")
+    # External process could be find combined with grep
+    # In practice this could be after json: -d 0 -v -s "find . -mmin +120 -maxdepth 2 -name '*.ts.meta'|grep -v .Trash"
+    parser.add_argument("-s", "--stream", help="Get file list from other process stream")
+    parser.add_argument("-i", "--stdin", help="Read filenames from pipe/stdin",
+                        action='store_true')
+    parser.add_argument("--verify_index", help="Read all meta files again and report entries that differ from the metadata index",
+                        action='store_true')
+    parser.add_argument("--rebuild_index", help="Discard the metadata index and build it again from meta files",
+                        action='store_true')
+    parser.add_argument("-j", "--io_workers", help="Number of threads reading meta files and file sizes. 1 reads files one by one.", type=int)
+    parser.add_argument("--resume_removal", help="Finish removals of interrupted earlier runs listed in removal journal",
+                        action='store_true')
+    parser.add_argument("--profile", help="Print time, memory and file operation counts of each stage. Give file name to write them as json.",
+                        nargs='?', const="-")
+    parser.add_argument("--watch", help="Keep running after the search and check new recordings when they are finished",
+                        action='store_true')
+    parser.add_argument("-w", "--write_config", help="Write current arguments to json config file. First directory argument and config_file not written there",
+                        action='store_true')
+    return parser
+
+
+def config_from_args(args):
+    """
+    Read config file and apply command line arguments over it
+    :param args: Parsed arguments
+    :return: Config
+    """
+    config = Config.load(default_config_name if args.config_file == "." else args.config_file)
+    if args.verbose:
+        config.verbose = bool(int(args.verbose))
+    if args.log_write_enabled:
+        config.log_write_enabled = bool(int(args.log_write_enabled))
+    if args.print_duplicates:
+        config.print_duplicates = bool(int(args.print_duplicates))
+    if args.delete_duplicates:
+        config.delete_duplicates = bool(int(args.delete_duplicates))
+    if args.io_workers:
+        config.io_workers = args.io_workers
+    if args.stream or type(args.stream) is str:
+        config.process_string = args.stream
+    if args.stdin:
+        config.read_from_stdin = True
+        if len(config.process_string) > 0:
+            print(f"Note: not calling read from other process as stdin read is defined.")
+            config.process_string = ""
+    config.verify_index = args.verify_index
+    config.rebuild_index = args.rebuild_index
+    if args.write_config:
+        config.save()
+    return config
+
+
+def print_result(finder, result):
+    # Print "Good" records and records to be removed
+    config = finder.config
+    if not config.print_duplicates or config.verbose:
+        print(f"Keep following records, count {len(result.keep)}")
+        for f in result.keep:
+            print(string_without_extension(f))
+        print(f"\nTo be removed records, count {len(result.remove)}")
+    # Files of dry run are listed after each record
+    record_files = finder.files_to_remove() if config.verbose and not config.removal_enabled else {}
+    for rec in result.remove:
+        if config.verbose or config.print_duplicates:
+            print(string_without_extension(rec))
+        for f in record_files.get(rec, []):
+            print(f"Would remove: {f}")
+
+
+def run(args):
+    config = config_from_args(args)
+    if args.profile:
+        profiler.enabled = True
+    finder = DuplicateFinder(args.directory[0] if len(args.directory) == 1 else args.directory, config)
+    if args.resume_removal:
+        finder.resume_removal()
+    result = finder.find()
+    print_result(finder, result)
+    for f in finder.remove_duplicates():
+        if config.verbose:
+            print(f"Removes: {f}")
+    finder.write_log()
+    if profiler.enabled:
+        profiler.report(args.profile)
+    if args.watch:
+        from .watch import Watcher
+        watcher = Watcher(finder)
+        watcher.load(finder.records)
+        watcher.run()
+    return result
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except DuplicateSearchError as error:
+        print(error)
+        sys.exit(error.exit_code)
@@ -0,0 +1,164 @@
+import os
+
+from .errors import ConfigError
+from .metaindex import meta_index_name
+
+default_config_name = "duplicate_config.json"
+default_config_json = '''
+{
+    "skipped_titles": [
+        "[.]Trash[/]",
+        "[Uu]utiset",
+        "Ylen aamu",
+        " Pilanp..?iten"
+    ],
+    "files_searched": [
+        "[.]ts[.]meta$"
+    ],
+    "file_size_factor": "0.90",
+    "use_empty_epg_description": "0",
+    "delete_duplicates": "0",
+    "include_subfolders": "1",
+    "print_duplicates": "1",
+    "verbose": "0",
+    "read_from_stdin": 0,
+    "process_string": "",
+    "log_write_enabled": "1",
+    "use_meta_index": "1",
+    "io_workers": "1",
+    "near_duplicate_search": "0",
+    "near_duplicate_threshold": "0.8",
+    "near_duplicate_bands": "16",
+    "near_duplicate_rows": "4",
+    "fingerprint_verification": "0",
+    "move_to_trash": "0",
+    "run_history": "1",
+    "root_settings": {},
+    "external_grouping": "0",
+    "grouping_memory_mb": "32",
+    "spill_folder": "",
+    "watch_debounce_seconds": "30",
+    "watch_use_polling": "0",
+    "watch_poll_seconds": "60",
+    "watch_niceness": "10",
+    "watch_max_deletions_per_hour": "20"
+}
+'''
+
+
+class Config:
+    """
+    Settings of duplicate search. Values are read from json config file and command line can change them afterwards.
+    Without json data default settings are used.
+    """
+    def __init__(self, json_data=None, filename=None):
+        if json_data is None:
+            import json
+            json_data = json.loads(default_config_json)
+        self.json_data = json_data
+        self.filename = filename
+        try:
+            self.must_have_patterns = json_data['files_searched']
+            self.skip_files_with_patterns = json_data['skipped_titles']
+            # if factor value is 0.95 then last recording size must me at least 95 % of earlier maximum
+            self.file_size_factor = float(json_data['file_size_factor'])
+            self.delete_duplicates = bool(int(json_data['delete_duplicates']))
+            self.use_empty_epg_description = bool(int(json_data['use_empty_epg_description']))
+            self.log_write_enabled = bool(int(json_data['log_write_enabled']))
+            self.include_subfolders = bool(int(json_data['include_subfolders']))  # includes also .Trash if not masked out
+            self.print_duplicates = bool(int(json_data['print_duplicates']))   # Supress other debug prints when true
+            self.verbose = bool(int(json_data['verbose']))
+            self.process_string = json_data['process_string']
+            self.read_from_stdin = bool(int(json_data['read_from_stdin']))
+            # Keys added later are optional so older config files are still valid
+            self.use_meta_index = bool(int(json_data.get('use_meta_index', "1")))
+            self.io_workers = int(json_data.get('io_workers', "1"))
+            # Similar, not only equal, title and description are duplicates. Threshold is Jaccard similarity of word shingles.
+            self.near_duplicate_search = bool(int(json_data.get('near_duplicate_search', "0")))
+            self.near_duplicate_threshold = float(json_data.get('near_duplicate_threshold', "0.8"))
+            self.near_duplicate_bands = int(json_data.get('near_duplicate_bands', "16"))
+            self.near_duplicate_rows = int(json_data.get('near_duplicate_rows', "4"))
+            # Duplicate is removed only when sampled content of .ts files is also equal
+            self.fingerprint_verification = bool(int(json_data.get('fingerprint_verification', "0")))
+            # Removed files are moved to .Trash folder of recording directory instead of deleting
+            self.move_to_trash = bool(int(json_data.get('move_to_trash', "0")))
+            # Settings of each recording directory, e.g. {"/media/usb/movie": {"io_workers": "1", "preference": "1"}}
+            self.root_settings = {os.path.normpath(path): {key: int(value) for key, value in settings.items()}
+                                  for path, settings in json_data.get('root_settings', {}).items()}
+            # Texts and grouping keys of records are kept in temporary files instead of memory. Partition of keys
+            # is grouped in memory only when its estimated size is below grouping_memory_mb. spill_folder should be on
+            # disk, not on RAM based /tmp. Empty means first recording directory.
+            self.external_grouping = bool(int(json_data.get('external_grouping', "0")))
+            self.grouping_memory_mb = int(json_data.get('grouping_memory_mb', "32"))
+            self.spill_folder = json_data.get('spill_folder', "")
+            # Decisions are appended to run history file of recording directory
+            self.run_history = bool(int(json_data.get('run_history', "1")))
+            # Watch mode: recording is checked when its meta file events and .ts size have been still this long
+            self.watch_debounce_seconds = float(json_data.get('watch_debounce_seconds', "30"))
+            # Folders are listed periodically instead of inotify, needed for SMB and NFS mounts
+            self.watch_use_polling = bool(int(json_data.get('watch_use_polling', "0")))
+            self.watch_poll_seconds = float(json_data.get('watch_poll_seconds', "60"))
+            # Added to process nice value. Disk I/O priority follows nice value when it is not set separately.
+            self.watch_niceness = int(json_data.get('watch_niceness', "10"))
+            # Removed records per hour, 0 is no limit
+            self.watch_max_deletions_per_hour = int(json_data.get('watch_max_deletions_per_hour', "20"))
+        except KeyError as error:
+            raise ConfigError(f"Config file is missing key, error in key: {error}\n"
+                              f"Fix error in file: {filename} or delete it and it will be created again")
+        except ValueError as error:
+            raise ConfigError(f"Config file has invalid value, {error}\nFix error in file: {filename}")
+
+        # Settings of one run, these are not stored to config file
+        self.verify_index = False
+        self.rebuild_index = False
+        # Index is stored next to configuration file. Without file it is stored to recording directory.
+        self.meta_index_filename = None
+        if filename is not None:
+            self.meta_index_filename = os.path.join(os.path.dirname(os.path.abspath(filename)), meta_index_name)
+
+    @classmethod
+    def load(cls, filename=default_config_name):
+        """
+        Read config file. Default config is written when file does not exist.
+        :param filename: Name of json config file
+        :return: Config
+        """
+        import json
+        if not os.path.exists(filename):
+            with open(filename, "w") as out_file:
+                json.dump(json.loads(default_config_json), out_file, indent=2)
+        try:
+            with open(filename) as f:
+                json_data = json.load(f)
+        except ValueError as error:
+            raise ConfigError(f"Config file {filename} cannot be read, {error}")
+        return cls(json_data, filename)
+
+    def root_setting(self, folder, key, default):
+        """
+        Setting of one recording directory
+        :param folder: Absolute path of recording directory
+        :param key: "io_workers" or "preference"
+        :param default: Value when directory has no such setting
+        :return: Integer value
+        """
+        return self.root_settings.get(os.path.normpath(folder), {}).get(key, default)
+
+    @property
+    def removal_enabled(self):
+        # When printing is selected then no actual removal is done unless deletion is asked
+        return self.delete_duplicates or not self.print_duplicates
+
+    def save(self):
+        import json
+        # Values that can be given on command line are written over values read from file
+        self.json_data['process_string'] = self.process_string
+        self.json_data['read_from_stdin'] = False   # If there will be argument set to false then current value could be stored
+        self.json_data['verbose'] = self.verbose
+        self.json_data['print_duplicates'] = self.print_duplicates
+        self.json_data['delete_duplicates'] = self.delete_duplicates
+        self.json_data['log_write_enabled'] = self.log_write_enabled
+        self.json_data['io_workers'] = self.io_workers
+        # Update this when new arguments are added and those are written to conf file
+        with open(self.filename, "w") as fp:
+            json.dump(self.json_data, fp, indent=2)
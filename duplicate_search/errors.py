@@ -0,0 +1,9 @@
+# Errors of duplicate search. Command line tool exits with exit_code of the error.
+
+
+class DuplicateSearchError(Exception):
+    exit_code = 1
+
+
+class ConfigError(DuplicateSearchError):
+    exit_code = 3
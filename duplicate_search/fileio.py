@@ -0,0 +1,51 @@
+from collections import deque
+
+from .profiling import profiler
+
+meta_file_extension = r"[.]ts[.]meta$"     # Use regex format
+
+
+def string_without_extension(s):
+    # Same as removing meta_file_extension match, without loading re module
+    return s[:-len(".ts.meta")] if s.endswith(".ts.meta") else s
+
+
+def read_meta_lines(f):
+    """
+    Read title and description lines of meta file
+    :param f: Name of .ts.meta file
+    :return: Tuple (line2, line3)
+    """
+    profiler.count('files_opened')
+    with open(f) as text_file:
+        line1 = text_file.readline()
+        line2 = text_file.readline()
+        line3 = text_file.readline()
+        if profiler.enabled:
+            # Position of the raw file is what buffered reads took from disk, asked only when profiling
+            profiler.count('bytes_read', text_file.buffer.raw.tell())
+    return line2.strip(), line3.strip()
+
+
+def map_io(func, items, workers=1):
+    """
+    Run blocking file operation for each item with bounded number of threads
+    :param func: Function taking one item
+    :param items: Iterable of items
+    :param workers: Thread count, 1 runs func serially in calling thread
+    :return: Generator of results in order of items
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Only limited number of requests are waiting so memory use stays bounded
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,546 @@
+import os
+import sys
+import time
+import contextlib
+
+from .config import Config
+from .errors import DuplicateSearchError
+from .fileio import meta_file_extension, string_without_extension, read_meta_lines, map_io
+from .grouping import DuplicateIndex, order_keeper_last
+from .metaindex import MetaIndex, meta_index_name
+from .profiling import profiler
+from .records import RecordStore
+from .removal import RemovalExecutor, removal_journal_name, new_run_id
+from .scan import PathFilter, walk_recordings, print_process_errors
+
+# Log contains list of record dates. Contains used index, result of duplicate test, filename, meta title and description, file size
+log_fieldnames = ['index', 'result', 'dupl_inx', 'filename', 'line2', 'line3', 'file_size', 'skip_pattern', 'similarity']
+log_filename = "duplicate_search_log.csv"
+
+
+class SearchResult:
+    """
+    Result of one duplicate search. Filenames are .ts.meta names as they were listed.
+    groups has one list of filenames for each set of duplicates, the kept record is last in the list.
+    """
+    def __init__(self, groups, keep, remove, skipped):
+        self.groups = groups
+        self.keep = keep
+        self.remove = remove
+        self.skipped = skipped  # (filename, pattern) of files skipped by pattern
+
+
+class DuplicateFinder:
+    """
+    Searches duplicate recordings from movie_root. Same finder can be run several times.
+    With one recording directory filenames are relative to it, current directory is changed there only during a run.
+    movie_root can also be a list of recording directories, for example internal disk, USB disk and network share.
+    Then filenames are absolute, current directory is not changed and each directory is scanned in own thread.
+    """
+    def __init__(self, movie_root, config=None):
+        self.config = config if config is not None else Config()
+        movie_roots = [movie_root] if isinstance(movie_root, str) else list(movie_root)
+        self.movie_path = movie_roots[0]
+        self.root_folders = [os.path.abspath(root) for root in movie_roots]
+        self.absolute_names = len(movie_roots) > 1
+        for root_id, folder in enumerate(self.root_folders):
+            for other in self.root_folders[:root_id]:
+                if folder == other or folder.startswith(other + os.sep) or other.startswith(folder + os.sep):
+                    raise DuplicateSearchError(f"Recording directories {other} and {folder} overlap")
+        # Thread count and keeper preference of each recording directory
+        self.root_workers = [self.config.root_setting(folder, 'io_workers', self.config.io_workers) for folder in self.root_folders]
+        self.root_preferences = [self.config.root_setting(folder, 'preference', 0) for folder in self.root_folders]
+        self.meta_index = None
+        index_filename = self.config.meta_index_filename
+        if index_filename is None:
+            index_filename = os.path.join(self.root_folders[0], meta_index_name)
+        if self.config.use_meta_index or self.config.verify_index or self.config.rebuild_index:
+            self.meta_index = MetaIndex(index_filename, self.config.rebuild_index, self.config.verify_index)
+
+        self.path_filter = PathFilter(self.config.must_have_patterns, self.config.skip_files_with_patterns)
+        # Each directory has own journal and trash so files are not moved between devices
+        self.removal_executors = []
+        for root_id, folder in enumerate(self.root_folders):
+            trash_folder = os.path.join(folder, ".Trash") if self.config.move_to_trash else None
+            executor = RemovalExecutor(os.path.join(folder, removal_journal_name), trash_folder, self.root_workers[root_id])
+            self.removal_executors.append(executor)
+        self.removal_executor = self.removal_executors[0]
+        movie_folder = self.root_folders[0]
+        self.history = None
+        if self.config.run_history:
+            from .history import RunHistory, run_history_name
+            self.history = RunHistory(os.path.join(movie_folder, run_history_name), self.removal_executor.run_id,
+                                      not self.config.removal_enabled)
+        self._reset()
+
+    def _reset(self, spill_folder=None):
+        # With spill_folder texts and grouping keys of records are kept in temporary files there
+        if getattr(self, 'records', None) is not None:
+            self.records.close()
+        self.records = RecordStore(spill_folder)
+        self.spill_index = None
+        if spill_folder is not None:
+            from .spill import SpillDuplicateIndex
+            self.spill_index = SpillDuplicateIndex(self.config.use_empty_epg_description,
+                                                   self.config.grouping_memory_mb * 1024 * 1024, spill_folder)
+        # Every search is a new run of journal and history
+        run_id = new_run_id()
+        for executor in self.removal_executors:
+            executor.start_run(run_id)
+        if self.history is not None:
+            self.history.run_id = run_id
+            self.history.dry_run = not self.config.removal_enabled
+        self.files_skipped_by_pattern = []
+        self.content_differs = set()    # Records of metadata groups not confirmed by fingerprint
+
+    @contextlib.contextmanager
+    def _in_movie_folder(self):
+        if self.absolute_names:
+            yield
+            return
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.root_folders[0])
+        except OSError as error:
+            raise DuplicateSearchError(f"Movie directory cannot be used, {error}")
+        if self.meta_index is not None:
+            # Relative names of index are resolved from recording directory
+            self.meta_index.base_folder = self.root_folders[0]
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+    def _write_csv_log(self):
+        if self.config.log_write_enabled:
+            import csv
+            similarity = None
+            if self.config.near_duplicate_search:
+                # Similarity to kept record
+                from .near import epg_similarity
+
+                def similarity(index, kept_index):
+                    return epg_similarity(*self.records.texts(index), *self.records.texts(kept_index))
+            with open(os.path.join(self.root_folders[0], log_filename), 'w', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=log_fieldnames)
+                writer.writeheader()
+                # Log is rendered from records at the end
+                writer.writerows(self.records.log_rows(similarity))
+                writer.writerows({'filename': name, 'index': -1, 'result': "-", 'skip_pattern': pattern_text}
+                                 for name, pattern_text in self.files_skipped_by_pattern)
+
+    # Filename processing first
+    def _get_files_for_checking(self, root_id=0, files_skipped=None):
+        """
+        List of files to search duplicates. Folders matching skip patterns are not listed at all.
+        :param root_id: Position of recording directory
+        :param files_skipped: List for skipped files, by default files_skipped_by_pattern
+        :return: List of filenames
+        """
+        files_skipped = files_skipped if files_skipped is not None else self.files_skipped_by_pattern
+        # Absolute path so relative recording directory works also after chdir, subfolder names have it as prefix
+        movie_root = self.root_folders[root_id]
+        pruned_dirs = []
+        try:
+            listing = walk_recordings(movie_root, self.config.include_subfolders, self.path_filter.prune_patterns, pruned_dirs)
+            names = self.path_filter.select(self._listing_names(listing), files_skipped)
+        except OSError as error:
+            raise DuplicateSearchError(f"File list cannot be read, {error}\nGiven movie directory is {movie_root}")
+        files_skipped.extend(pruned_dirs)
+        if len(self.config.must_have_patterns) > 0:
+            names.sort()
+            files_skipped.sort()
+        if len(names) < 2 and not self.absolute_names:
+            print(f"Check path for directory as there are not enough files.")
+        return names
+
+    def _listing_names(self, listing):
+        # DirEntry is not kept, its stat() on Linux is a new system call like os.stat
+        for name, entry in listing:
+            yield entry.path if self.absolute_names else name
+
+    def _scan_root(self, root_id):
+        # Listing and meta reading of one recording directory with its own thread count
+        files_skipped = []
+        names = self._get_files_for_checking(root_id, files_skipped)
+        return list(map_io(self._read_named_meta, names, self.root_workers[root_id])), files_skipped
+
+    def _scan_roots(self):
+        # Recording directories are scanned at the same time so slow network share does not delay the others
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(self.root_folders)) as executor:
+            scans = list(executor.map(self._scan_root, range(len(self.root_folders))))
+        # Records are added in order of directories so result does not depend on thread timing
+        for root_id, (metas, files_skipped) in enumerate(scans):
+            for f, lines in metas:
+                self._add_record(f, lines, root_id)
+            self.files_skipped_by_pattern.extend(files_skipped)
+        if len(self.records) < 2:
+            print(f"Check paths of directories as there are not enough files.")
+
+    def root_id_of(self, name):
+        """
+        Recording directory of file
+        :param name: Filename as in records
+        :return: Position of directory in root_folders
+        """
+        if self.absolute_names:
+            for root_id, folder in enumerate(self.root_folders):
+                if name.startswith(folder + os.sep):
+                    return root_id
+        return 0
+
+    def _map_by_root(self, func, indexes):
+        """
+        Run blocking file operation for records. Records of each directory use thread count of the directory
+        and directories are handled at the same time.
+        :param func: Function taking record filename
+        :param indexes: Record indexes
+        :return: List of results in order of indexes
+        """
+        filenames = self.records.filenames
+        if not self.absolute_names:
+            return list(map_io(func, (filenames[index] for index in indexes), self.root_workers[0]))
+        positions_by_root = {}
+        for position, index in enumerate(indexes):
+            positions_by_root.setdefault(self.records.root_ids[index], []).append(position)
+        results = [None] * len(indexes)
+
+        def run_root(root_id, positions):
+            names = (filenames[indexes[position]] for position in positions)
+            for position, result in zip(positions, map_io(func, names, self.root_workers[root_id])):
+                results[position] = result
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(len(positions_by_root), 1)) as executor:
+            for future in [executor.submit(run_root, root_id, positions) for root_id, positions in positions_by_root.items()]:
+                future.result()
+        return results
+
+    def _get_files_via_process(self):
+        # Simple as all lines are filenames with full path
+        # Names are given as soon as process writes them so meta reading runs while listing continues
+        import re
+        import subprocess
+        import threading
+        start = time.time()
+        process = subprocess.Popen(self.config.process_string, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True,
+                                   text=True, bufsize=1)
+        # Error output is read in own thread so full pipe cannot block the process
+        error_reader = threading.Thread(target=print_process_errors, args=(process.stderr,), daemon=True)
+        error_reader.start()
+        p = re.compile(meta_file_extension)
+        first_non_meta = False
+        for line in process.stdout:
+            f = line.rstrip('\n')
+            if p.search(f):
+                yield f
+            elif f != '' and not first_non_meta:
+                first_non_meta = True
+                print(f"Error first not meta filename in given process output is '{f}'.\nOther non meta lines are skipped.")
+        process.stdout.close()
+        return_code = process.wait()
+        error_reader.join()
+
+        t = time.time() - start
+        if self.config.verbose:
+            print(f"Elapsed time {t} for process {self.config.process_string}")
+        if return_code != 0:
+            print(f"Process ended with code {return_code}, file list may be incomplete")
+
+    def _get_files_from_stdin(self):
+        import re
+        p = re.compile(meta_file_extension)
+        for line in sys.stdin:
+            if line.strip() == '':
+                break
+            if not p.search(line):
+                print(f"Error: line do not have meta file extension. Rest lines are skipped. Line: {line}")
+                break
+            yield line.strip()
+
+    def _read_meta_if_named(self, f):
+        # Meta file is read only when its name has date, channel and title parts
+        name = f.split('.')
+        if len(name) >= 3 and name[-2] == 'ts' and name[-1] == 'meta' and len(name[-3].split(' - ')) >= 3:
+            if self.meta_index is not None:
+                return self.meta_index.read_meta(f)
+            return read_meta_lines(f)
+        return None
+
+    def _ts_size(self, name):
+        # Size of .ts file belonging to meta file, None when .ts is missing
+        pathname, extension = os.path.splitext(name)    # drop .meta extension from .ts.meta
+        try:
+            # Always asked from file system, deleted or replaced .ts must not be kept by old size
+            profiler.count('stat_calls')
+            return os.stat(pathname).st_size
+        except FileNotFoundError:
+            return None
+
+    def _read_named_meta(self, f):
+        return f, self._read_meta_if_named(f)
+
+    def _fingerprint(self, name):
+        # Sampled fingerprint of .ts file belonging to meta file, None when .ts is missing
+        try:
+            if self.meta_index is not None:
+                return self.meta_index.fingerprint(name)
+            from .fingerprint import sample_fingerprint
+            pathname, extension = os.path.splitext(name)
+            profiler.count('stat_calls')
+            return sample_fingerprint(pathname, os.stat(pathname).st_size)
+        except FileNotFoundError:
+            return None
+
+    def _confirm_by_fingerprint(self, groups):
+        # Groups are split by .ts fingerprint. Only records of metadata groups are fingerprinted.
+        members = [file_inx for dupl_list in groups for file_inx in dupl_list]
+        fingerprints = dict(zip(members, self._map_by_root(self._fingerprint, members)))
+        confirmed = []
+        for dupl_list in groups:
+            same_content = {}
+            for file_inx in dupl_list:
+                if fingerprints[file_inx] is not None:
+                    same_content.setdefault(fingerprints[file_inx], []).append(file_inx)
+            for group in same_content.values():
+                if len(group) > 1:
+                    confirmed.append(group)
+                else:
+                    self.content_differs.update(group)
+        confirmed.sort()
+        return confirmed
+
+    def _collect_meta_data(self, names):
+        # file count and positions are fixed
+        # Files are read by io_workers threads, results come in order of names. names can be a generator.
+        for f, lines in map_io(self._read_named_meta, names, self.root_workers[0]):
+            self._add_record(f, lines, self.root_id_of(f))
+
+    def _add_record(self, f, lines, root_id=0):
+        # Meta texts are stored only when name has date, channel and title parts
+        if lines is not None:
+            index = self.records.add(f, lines[0], lines[1], root_id)
+        else:
+            index = self.records.add(f, root_id=root_id)
+        if self.spill_index is not None:
+            # Grouping key goes to partition file as soon as it is read, text file is not read back
+            self.spill_index.add(index, *(lines if lines is not None else ("", "")))
+
+    def _find_duplicates(self):
+        # Compare if same Title and contents is found from records
+        # Records are grouped by (title line, description line) in one pass
+        config = self.config
+        records = self.records
+        if self.spill_index is not None:
+            # Keys were written to partition files while meta files were read
+            duplicate_index = self.spill_index
+            self.spill_index = None
+        else:
+            if config.near_duplicate_search:
+                from .near import NearDuplicateIndex
+                duplicate_index = NearDuplicateIndex(config.use_empty_epg_description, config.near_duplicate_threshold,
+                                                     config.near_duplicate_bands, config.near_duplicate_rows)
+            else:
+                duplicate_index = DuplicateIndex(config.use_empty_epg_description)
+            for index in range(len(records)):
+                duplicate_index.add(index, *records.texts(index))
+        found_duplicates = duplicate_index.duplicate_groups()
+        del duplicate_index
+
+        if config.verbose:
+            print(f"Found {len(found_duplicates)} duplicates\n{found_duplicates}\n")
+        if config.fingerprint_verification:
+            found_duplicates = self._confirm_by_fingerprint(found_duplicates)
+            if config.verbose:
+                print(f"Confirmed by fingerprint {len(found_duplicates)} duplicates\n{found_duplicates}\n")
+        # Search biggest file and select it if bigger than last one. Marginal in comparison is 1%
+        members = [file_inx for dupl_list in found_duplicates for file_inx in dupl_list]
+        file_sizes = iter(self._map_by_root(self._ts_size, members))
+        del members
+        for dupl_list in found_duplicates:
+            sizes = []
+            for file_inx in dupl_list:
+                size_of_file = next(file_sizes)
+                if size_of_file is None:
+                    size_of_file = 0
+                else:
+                    records.file_sizes[file_inx] = size_of_file
+                sizes.append(size_of_file)
+            preferences = None
+            if self.absolute_names:
+                # Equal sizes on several devices are decided by preference of directory
+                preferences = [self.root_preferences[records.root_ids[file_inx]] for file_inx in dupl_list]
+            records.add_group(order_keeper_last(dupl_list, sizes, config.file_size_factor, preferences))
+
+    def _collect_removal_status(self):
+        # Last index of each group is kept, all others are removed
+        records = self.records
+        for index in range(len(records)):
+            group_id = records.group_ids[index]
+            if group_id != -1 and records.group(group_id)[-1] != index:
+                records.removed[index] = 1
+            if self.history is not None:
+                self._write_history(index)
+        if self.history is not None:
+            for name, pattern_text in self.files_skipped_by_pattern:
+                self.history.write("skip", name, f"matches skip pattern {pattern_text}")
+            self.history.close()
+
+    def _history_fields(self, index):
+        # Row fields of record in duplicate group
+        records = self.records
+        members = records.group(records.group_ids[index])
+        keeper = members[-1]
+        fields = {'title': records.stored_texts(index)[0], 'file_size': records.file_sizes[index],
+                  'keeper': records.filenames[keeper]}
+        if index != keeper:
+            fields['keeper_size'] = records.file_sizes[keeper]
+        return fields
+
+    def _write_history(self, index):
+        # Only records of duplicate groups are written so history does not grow by whole archive on every run
+        records = self.records
+        group_id = records.group_ids[index]
+        filename = records.filenames[index]
+        if group_id == -1:
+            if index in self.content_differs:
+                self.history.write("keep", filename, ".ts content differs from records with same title and description",
+                                   title=records.stored_texts(index)[0])
+            return
+        members = records.group(group_id)
+        keeper = members[-1]
+        fields = self._history_fields(index)
+        if index != keeper:
+            # Real removals are written by remove_duplicates() from files that were removed
+            if self.history.dry_run:
+                self.history.write("suggest", filename, f"duplicate of {records.filenames[keeper]}", **fields)
+        elif records.file_sizes[keeper] >= max(records.file_sizes[m] for m in members):
+            self.history.write("keep", filename, f"biggest of {len(members)} copies", **fields)
+        else:
+            self.history.write("keep", filename, f"last of {len(members)} copies and at least "
+                                                 f"{self.config.file_size_factor} of the biggest", **fields)
+
+    def _result(self):
+        records = self.records
+        groups = [[records.filenames[file_inx] for file_inx in dupl_list] for dupl_list in records.groups()]
+        keep = [f for f, removed in zip(records.filenames, records.removed) if not removed]
+        return SearchResult(groups, keep, self.removed_files(), self.files_skipped_by_pattern)
+
+    def removed_files(self):
+        # Records selected for removal in index order
+        return [f for f, removed in zip(self.records.filenames, self.records.removed) if removed]
+
+    def find(self, names=None):
+        """
+        Search duplicates. Files are not removed.
+        :param names: Optional iterable of .ts.meta filenames. By default files are listed as configured.
+        :return: SearchResult
+        """
+        config = self.config
+        spill_folder = None
+        if config.external_grouping:
+            if config.near_duplicate_search:
+                print("Near duplicate search groups records in memory, external grouping is not used")
+            else:
+                spill_folder = config.spill_folder or self.root_folders[0]
+        self._reset(spill_folder)
+        # Only full directory listing tells which files are deleted
+        full_listing = names is None and not config.read_from_stdin and len(config.process_string) == 0
+        with self._in_movie_folder():
+            if names is not None:
+                names = self.path_filter.iter_select(names, self.files_skipped_by_pattern)
+            elif config.read_from_stdin:
+                names = self.path_filter.iter_select(self._get_files_from_stdin(), self.files_skipped_by_pattern)
+            elif len(config.process_string) > 0:
+                names = self.path_filter.iter_select(self._get_files_via_process(), self.files_skipped_by_pattern)
+            elif self.absolute_names:
+                with profiler.stage("directory scans"):
+                    self._scan_roots()
+            else:
+                with profiler.stage("listing"):
+                    names = self._get_files_for_checking()
+            # With stream input listing is done while meta files are read
+            if names is not None or not self.absolute_names:
+                with profiler.stage("meta collection"):
+                    self._collect_meta_data(names)
+            with profiler.stage("duplicate finding"):
+                self._find_duplicates()
+            if self.meta_index is not None:
+                with profiler.stage("index save"):
+                    self.meta_index.save(self.root_folders if full_listing else ())
+                if config.verbose:
+                    print(f"Metadata index hits {self.meta_index.hits}, files read {self.meta_index.misses}, mismatches {self.meta_index.mismatches}")
+            with profiler.stage("removal status"):
+                self._collect_removal_status()
+        return self._result()
+
+    def files_to_remove(self):
+        """
+        Files of records in remove list
+        :return: Dict from record filename to list of its files, in order of remove list
+        """
+        with self._in_movie_folder():
+            return {rec: self.removal_executor_of(rec).sibling_files(string_without_extension(rec))
+                    for rec in self.removed_files()}
+
+    def removal_executor_of(self, name):
+        # Removal of file is done by executor of its recording directory
+        return self.removal_executors[self.root_id_of(name)]
+
+    def remove_duplicates(self):
+        """
+        Remove files of records found by find(). Removal is done only when enabled by configuration.
+        :return: List of removed files
+        """
+        if not self.config.removal_enabled:
+            return []
+        files_by_root = [[] for folder in self.root_folders]
+        record_files = self.files_to_remove()
+        for rec, files in record_files.items():
+            files_by_root[self.root_id_of(rec)].extend(files)
+        removed_files = []
+        with profiler.stage("removal"):
+            with self._in_movie_folder():
+                for executor, files in zip(self.removal_executors, files_by_root):
+                    if files or not self.absolute_names:
+                        removed_files.extend(executor.remove_files(files))
+        if self.history is not None:
+            self._write_removal_history(record_files, set(removed_files))
+        return removed_files
+
+    def _write_removal_history(self, record_files, removed_files):
+        """
+        Write result of removal of each record to history
+        :param record_files: Dict from record filename to its files
+        :param removed_files: Set of files that were removed
+        """
+        from .history import removal_result
+        records = self.records
+        for index, filename in enumerate(records.filenames):
+            if not records.removed[index]:
+                continue
+            fields = self._history_fields(index)
+            action, reason = removal_result(filename, record_files[filename], removed_files, fields['keeper'])
+            self.history.write(action, filename, reason, **fields)
+        self.history.close()
+
+    def resume_removal(self):
+        # Finish removals of interrupted earlier runs
+        removed_files = []
+        with profiler.stage("resume removal"):
+            with self._in_movie_folder():
+                for executor in self.removal_executors:
+                    removed_files.extend(executor.resume())
+        return removed_files
+
+    def write_log(self):
+        with self._in_movie_folder():
+            self._write_csv_log()
+
+    def process_the_data(self):
+        # Whole run: search, remove and write log
+        result = self.find()
+        self.remove_duplicates()
+        self.write_log()
+        return result
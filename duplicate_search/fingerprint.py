@@ -0,0 +1,45 @@
+import mmap
+import hashlib
+
+from .profiling import profiler
+
+ts_packet_size = 188
+fingerprint_sample_size = ts_packet_size * 1024     # Bytes hashed from head, middle and tail of .ts
+
+
+def sample_offsets(size):
+    """
+    Start positions of fingerprint samples: head, middle and tail of file at TS packet boundaries
+    :param size: File size in bytes
+    :return: Sorted list of offsets
+    """
+    middle = (size // 2) // ts_packet_size * ts_packet_size
+    tail = max(0, (size - fingerprint_sample_size) // ts_packet_size * ts_packet_size)
+    return sorted({0, middle, tail})
+
+
+def sample_fingerprint(pathname, size):
+    """
+    Hash file size and few samples of .ts file. Only samples are mapped to memory, file is never read in full.
+    :param pathname: Name of .ts file
+    :param size: File size in bytes
+    :return: Fingerprint as hex string
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    if size == 0:
+        return digest.hexdigest()
+    profiler.count('files_opened')
+    with open(pathname, "rb") as f:
+        for offset in sample_offsets(size):
+            length = min(fingerprint_sample_size, size - offset)
+            profiler.count('bytes_read', length)
+            # mmap offset must be multiple of allocation granularity
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+            try:
+                with mmap.mmap(f.fileno(), offset - start + length, access=mmap.ACCESS_READ, offset=start) as m:
+                    digest.update(m[offset - start:])
+            except (OSError, ValueError):
+                # File system without mmap support
+                f.seek(offset)
+                digest.update(f.read(length))
+    return digest.hexdigest()
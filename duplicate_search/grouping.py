@@ -0,0 +1,56 @@
+# Exact duplicate grouping and selection of kept record
+
+
+def order_keeper_last(dupl_list, sizes, file_size_factor, preferences=None):
+    """
+    Select the record to keep from one duplicate group
+    :param dupl_list: Record indexes of the group in ascending order
+    :param sizes: .ts file sizes in same order as dupl_list, 0 when file is missing
+    :param file_size_factor: Last record is kept when it is at least this part of the biggest one
+    :param preferences: Optional preference of each record. Among records of same size as the selected one
+        the record with highest preference is kept.
+    :return: New list where the kept record is the last element
+    """
+    result = list(dupl_list)
+    max_value = 0
+    max_inx = 0
+    for inx, size_of_file in enumerate(sizes):
+        if size_of_file >= max_value:
+            max_value = size_of_file
+            max_inx = inx
+    if max_inx != len(result)-1 and max_value*file_size_factor > sizes[-1]*1.0:
+        keep_inx = max_inx
+    else:
+        keep_inx = len(result)-1
+    if preferences is not None:
+        same_size = [inx for inx in range(len(sizes)) if sizes[inx] == sizes[keep_inx]]
+        best = max(preferences[inx] for inx in same_size)
+        if preferences[keep_inx] < best:
+            keep_inx = [inx for inx in same_size if preferences[inx] == best][-1]
+    if keep_inx != len(result)-1:
+        # swap last and value in keep_inx
+        result[keep_inx], result[-1] = result[-1], result[keep_inx]
+    return result
+
+
+class DuplicateIndex:
+    """
+    Groups records by (title line, description line). Records must be added in index order.
+    """
+    def __init__(self, use_empty_epg_description=False):
+        self.use_empty_epg_description = use_empty_epg_description
+        self.groups = {}
+
+    def add(self, index, line2, line3):
+        # Record without description is not compared unless allowed by configuration
+        if not self.use_empty_epg_description and line3 == "":
+            return
+        group = self.groups.get((line2, line3))
+        if group is None:
+            self.groups[(line2, line3)] = [index]
+        else:
+            group.append(index)
+
+    def duplicate_groups(self):
+        # dict keeps insertion order so groups are ordered by their first index
+        return [group for group in self.groups.values() if len(group) > 1]
@@ -0,0 +1,134 @@
+import os
+import time
+
+# Decisions of all runs, one json object per line. File is only appended.
+run_history_name = "duplicate_run_history.jsonl"
+
+
+class RunHistory:
+    """
+    Append-only history of decisions. Each row is written when decision is made so nothing is collected in memory
+    and a crash loses at most the row being written.
+    """
+    def __init__(self, filename, run_id, dry_run=False):
+        self.filename = filename
+        self.run_id = run_id
+        self.dry_run = dry_run
+        self.fp = None
+
+    def write(self, action, filename, reason, **fields):
+        """
+        Append one decision
+        :param action: "keep", "suggest", "remove", "failed" or "skip". "suggest" is a record selected for
+            removal in dry run, "remove" and "failed" are written after removal was tried.
+        :param filename: Record filename
+        :param reason: Text telling why
+        :param fields: Other values of row, for example file_size and keeper
+        """
+        import json
+        if self.fp is None:
+            # Line buffered so every row goes to file when written
+            self.fp = open(self.filename, "a", buffering=1, encoding="utf-8")
+        row = {'run': self.run_id, 'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'action': action,
+               'filename': filename, 'reason': reason}
+        if self.dry_run:
+            row['dry_run'] = True
+        row.update(fields)
+        self.fp.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+
+def removal_result(record, files, removed_files, keeper):
+    """
+    Action and reason of one record after removal was tried
+    :param record: Record filename, the .ts.meta file
+    :param files: Files of record that were given to removal
+    :param removed_files: Files that were removed
+    :param keeper: Filename of kept copy
+    :return: Tuple (action, reason), action is "remove" or "failed"
+    """
+    if not files:
+        return "failed", "removal failed, no files of record were found"
+    files_left = [f for f in files if f not in removed_files]
+    if files_left:
+        return "failed", f"removal failed, files left: {', '.join(files_left)}"
+    if record not in removed_files:
+        return "failed", "removal failed, meta file was not among removed files"
+    return "remove", f"duplicate of {keeper}"
+
+
+def read_history(filename, texts=None):
+    """
+    Read rows of history file one by one
+    :param filename: History file
+    :param texts: Optional list of texts, only rows containing one of them are parsed
+    :return: Generator of row dicts in file order
+    """
+    import json
+    with open(filename, encoding="utf-8") as fp:
+        for line in fp:
+            if texts is not None and not any(text in line for text in texts):
+                continue    # Fast check before json parsing
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue    # Last line could be partial after crash
+
+
+def removed_rows(filename, since=None, include_dry_run=False):
+    # Records removed by the runs and failed removals, with include_dry_run also records selected in dry runs
+    texts = ['"action": "remove"', '"action": "failed"']
+    if include_dry_run:
+        texts.append('"action": "suggest"')
+    for row in read_history(filename, texts):
+        if (include_dry_run or not row.get('dry_run')) and (since is None or row['time'] >= since):
+            yield row
+
+
+def decision_rows(filename, name):
+    # All decisions of records having name as part of filename
+    for row in read_history(filename, [name.replace("\\", "\\\\").replace('"', '\\"')]):
+        if name in row['filename']:
+            yield row
+
+
+def row_note(row):
+    # Reason of failed row tells that removal failed
+    return " (dry run)" if row.get('dry_run') else ""
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m duplicate_search.history",
+                                     description="Query decisions of earlier duplicate search runs")
+    parser.add_argument("directory", help="Recording directory where history file is")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    removed = subparsers.add_parser("removed", help="List removed records")
+    removed.add_argument("--since", help="Only runs from this time, for example 2024-05-01")
+    removed.add_argument("--dry_run", help="Include records that were only suggested to be removed", action='store_true')
+    why = subparsers.add_parser("why", help="Tell why a recording was kept, removed or skipped")
+    why.add_argument("name", help="Part of recording filename")
+    args = parser.parse_args(argv)
+
+    filename = os.path.join(args.directory, run_history_name)
+    if not os.path.exists(filename):
+        print(f"No run history in {filename}")
+        return
+    if args.command == "removed":
+        for row in removed_rows(filename, args.since, args.dry_run):
+            print(f"{row['time']} {row['filename']}: {row['reason']}" + row_note(row))
+    else:
+        found = False
+        for row in decision_rows(filename, args.name):
+            found = True
+            print(f"{row['time']} {row['action']:7} {row['filename']}: {row['reason']}" + row_note(row))
+        if not found:
+            print(f"No decisions found for {args.name}, records without duplicates are not written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import threading
+
+from .fileio import read_meta_lines
+from .profiling import profiler
+
+meta_index_name = "duplicate_meta_index.json"
+meta_index_version = 2     # Version 1 had relative names and cached .ts sizes
+
+
+class MetaIndex:
+    """
+    On-disk cache of meta file contents and .ts fingerprints. Entry is valid while meta file mtime and size
+    are unchanged, fingerprint while .ts mtime and size are unchanged.
+    Names are absolute so one index can serve several recording directories. Relative names are
+    joined to base_folder, the recording directory of the run.
+    File is replaced atomically so crash during write leaves previous index in place.
+    Lookups can be done from several reader threads.
+    """
+    def __init__(self, index_filename, rebuild=False, verify=False):
+        import json
+        self.index_filename = index_filename
+        self.verify = verify
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.fingerprints = {}
+        self.seen = set()
+        self.base_folder = os.getcwd()
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+        if rebuild:
+            self.changed = True
+            return
+        try:
+            with open(index_filename) as f:
+                data = json.load(f)
+            if data.get('version') == meta_index_version:
+                self.entries = data['entries']
+                self.fingerprints = data.get('fingerprints', {})
+            else:
+                self.changed = True
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as error:
+            print(f"Metadata index {index_filename} cannot be used, it is built again. {error}")
+            self.changed = True
+
+    def _key(self, f):
+        return os.path.join(self.base_folder, f)
+
+    def read_meta(self, f):
+        """
+        Get title and description lines of meta file, from index when file has not changed
+        :param f: Name of .ts.meta file
+        :return: Tuple (line2, line3)
+        """
+        profiler.count('stat_calls')
+        stat_of_file = os.stat(f)
+        key = self._key(f)
+        with self.lock:
+            self.seen.add(key)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stat_of_file.st_mtime_ns and entry[1] == stat_of_file.st_size:
+                if not self.verify:
+                    self.hits += 1
+                    return entry[2], entry[3]
+            else:
+                entry = None
+            self.misses += 1
+        line2, line3 = read_meta_lines(f)
+        with self.lock:
+            if entry is not None:
+                if entry[2] == line2 and entry[3] == line3:
+                    return line2, line3
+                self.mismatches += 1
+                print(f"Metadata index differs for {f}")
+            self.entries[key] = [stat_of_file.st_mtime_ns, stat_of_file.st_size, line2, line3]
+            self.changed = True
+        return line2, line3
+
+    def fingerprint(self, f):
+        """
+        Get sampled fingerprint of .ts file belonging to given meta file. Raises FileNotFoundError when .ts is missing.
+        :param f: Name of .ts.meta file
+        :return: Fingerprint as hex string
+        """
+        pathname, extension = os.path.splitext(f)
+        profiler.count('stat_calls')
+        stat_of_file = os.stat(pathname)
+        key = self._key(pathname)
+        with self.lock:
+            entry = self.fingerprints.get(key)
+            if entry is not None and entry[0] == stat_of_file.st_mtime_ns and entry[1] == stat_of_file.st_size:
+                if not self.verify:
+                    return entry[2]
+            else:
+                entry = None
+        from .fingerprint import sample_fingerprint
+        fingerprint = sample_fingerprint(pathname, stat_of_file.st_size)
+        with self.lock:
+            if entry is not None and entry[2] != fingerprint:
+                self.mismatches += 1
+                print(f"Metadata index fingerprint differs for {pathname}")
+            self.fingerprints[key] = [stat_of_file.st_mtime_ns, stat_of_file.st_size, fingerprint]
+            self.changed = True
+        return fingerprint
+
+    def save(self, prune_folders=()):
+        """
+        Write index when it has changed
+        :param prune_folders: Absolute folders whose entries are dropped for files not seen in this run.
+            Give only folders that were listed completely, entries of other folders are kept.
+        """
+        import json
+        prefixes = tuple(os.path.join(folder, "") for folder in prune_folders)
+        if prefixes:
+            for name in [name for name in self.entries if name.startswith(prefixes) and name not in self.seen]:
+                del self.entries[name]
+                self.changed = True
+            for name in [name for name in self.fingerprints if name.startswith(prefixes) and name + ".meta" not in self.seen]:
+                del self.fingerprints[name]
+                self.changed = True
+        if not self.changed:
+            return
+        tmp_filename = self.index_filename + ".tmp"
+        try:
+            with open(tmp_filename, "w") as fp:
+                json.dump({'version': meta_index_version, 'entries': self.entries, 'fingerprints': self.fingerprints},
+                          fp, separators=(',', ':'))
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp_filename, self.index_filename)
+            self.changed = False
+        except OSError as error:
+            print(f"Metadata index cannot be written, {error}")
@@ -0,0 +1,139 @@
+import re
+import zlib
+import random
+import unicodedata
+
+from .grouping import DuplicateIndex
+
+near_shingle_words = 2     # Words in one shingle of near duplicate search
+mersenne_prime = (1 << 61) - 1
+trailing_tag_pattern = re.compile(r"\s*[(\[]([^()\[\]]{0,24})[)\]]\W*$")
+non_word_pattern = re.compile(r"[\W_]+")
+number_pattern = re.compile(r"\d+")
+# Episode and part numbers like 3/8, osa 3, jakso 12, kausi 2 or s02e05. Other numbers, for example
+# in channel names like Yle TV1 or MTV3, do not tell records apart.
+episode_pattern = re.compile(r"\d+\s*/\s*\d+|\b(?:osa|jakso|kausi|part|episode|season|ep)\.?\s*\d+|\bs\d+\s*e\d+")
+
+
+def normalize_epg_text(text):
+    """
+    Normalize EPG text for near duplicate comparison. Case, punctuation, extra whitespace and
+    trailing bracketed tags like (R), [HD] or (Yle TV1) are ignored. Tags with episode number like (3/8) are kept.
+    :param text: Title or description line
+    :return: Normalized text
+    """
+    text = unicodedata.normalize('NFKC', text).casefold()
+    match = trailing_tag_pattern.search(text)
+    while match is not None and episode_pattern.search(match.group(1)) is None:
+        text = text[:match.start()]
+        match = trailing_tag_pattern.search(text)
+    return " ".join(non_word_pattern.sub(" ", text).split())
+
+
+def epg_shingles(line2, line3):
+    """
+    Set of word shingles of normalized title and description
+    :param line2: Title line of meta file
+    :param line3: Description line of meta file
+    :return: Set of shingle strings
+    """
+    words = normalize_epg_text(line2).split() + ["|"] + normalize_epg_text(line3).split()
+    if len(words) <= near_shingle_words:
+        return {" ".join(words)}
+    return {" ".join(words[i:i+near_shingle_words]) for i in range(len(words)-near_shingle_words+1)}
+
+
+def epg_numbers(line2, line3):
+    """
+    Episode numbers of title and description, records with different numbers are different episodes or parts
+    :param line2: Title line of meta file
+    :param line3: Description line of meta file
+    :return: Tuple of number strings
+    """
+    text = unicodedata.normalize('NFKC', line2 + " | " + line3).casefold()
+    return tuple(number for marker in episode_pattern.findall(text) for number in number_pattern.findall(marker))
+
+
+def epg_similarity(line2_a, line3_a, line2_b, line3_b):
+    """
+    Jaccard similarity of shingles of two records, 0.0 when their episode numbers differ
+    :return: Value between 0.0 and 1.0
+    """
+    if epg_numbers(line2_a, line3_a) != epg_numbers(line2_b, line3_b):
+        return 0.0
+    shingles_a = epg_shingles(line2_a, line3_a)
+    shingles_b = epg_shingles(line2_b, line3_b)
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+class NearDuplicateIndex(DuplicateIndex):
+    """
+    Groups records whose normalized title and description are similar. Exact duplicates share one MinHash signature.
+    Signature is split to bands and only records sharing a band bucket are compared.
+    Records with different episode numbers in their texts are never joined, see epg_numbers.
+    Similar records are joined to same group also through other records.
+    """
+    def __init__(self, use_empty_epg_description=False, threshold=0.8, bands=16, rows=4):
+        super().__init__(use_empty_epg_description)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        generator = random.Random(bands * 1000 + rows)     # Same permutations on every run
+        self.permutations = [(generator.randrange(1, mersenne_prime), generator.randrange(0, mersenne_prime))
+                             for i in range(bands * rows)]
+        self.keys = []
+        self.parent = []
+        self.buckets = {}
+
+    def add(self, index, line2, line3):
+        if not self.use_empty_epg_description and line3 == "":
+            return
+        group = self.groups.get((line2, line3))
+        if group is not None:
+            group.append(index)
+            return
+        self.groups[(line2, line3)] = [index]
+        key_id = len(self.keys)
+        self.keys.append((line2, line3))
+        self.parent.append(key_id)
+
+        shingles = epg_shingles(line2, line3)
+        numbers = epg_numbers(line2, line3)
+        hashes = [zlib.crc32(shingle.encode()) for shingle in shingles]
+        signature = [min((a * x + b) % mersenne_prime for x in hashes) for a, b in self.permutations]
+        compared = set()
+        for band in range(self.bands):
+            bucket_key = (band, tuple(signature[band*self.rows:(band+1)*self.rows]))
+            bucket = self.buckets.get(bucket_key)
+            if bucket is None:
+                self.buckets[bucket_key] = [key_id]
+                continue
+            for other_id in bucket:
+                if other_id in compared:
+                    continue
+                compared.add(other_id)
+                if epg_numbers(*self.keys[other_id]) != numbers:
+                    continue
+                other_shingles = epg_shingles(*self.keys[other_id])
+                if len(shingles & other_shingles) / len(shingles | other_shingles) >= self.threshold:
+                    self._join(key_id, other_id)
+            bucket.append(key_id)
+
+    def _root(self, key_id):
+        while self.parent[key_id] != key_id:
+            self.parent[key_id] = self.parent[self.parent[key_id]]
+            key_id = self.parent[key_id]
+        return key_id
+
+    def _join(self, key_a, key_b):
+        root_a = self._root(key_a)
+        root_b = self._root(key_b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def duplicate_groups(self):
+        # Root is always the first added key of its group so groups stay ordered by first index
+        joined = {}
+        for key_id, group in enumerate(self.groups.values()):
+            joined.setdefault(self._root(key_id), []).extend(group)
+        return [sorted(group) for group in joined.values() if len(group) > 1]
@@ -0,0 +1,71 @@
+import sys
+import time
+import threading
+import contextlib
+
+profile_counter_names = ['directory_listings', 'stat_calls', 'files_opened', 'bytes_read', 'files_unlinked', 'files_moved']
+
+
+class Profiler:
+    """
+    Wall time, CPU time and peak memory of processing stages and counters of file system operations.
+    When not enabled, stage() and count() do nothing else than check the flag.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(profile_counter_names, 0)
+        self.stages = []
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += amount
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        counters_at_start = dict(self.counters)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'stage': name,
+                'wall_s': round(time.perf_counter() - wall, 6),
+                'cpu_s': round(time.process_time() - cpu, 6),
+                'peak_rss_kb': peak_rss_kb(),
+                'counters': {key: self.counters[key] - counters_at_start[key] for key in profile_counter_names}})
+
+    def report(self, target):
+        """
+        Print profile or write it as json
+        :param target: "-" for stdout, otherwise json filename
+        """
+        import json
+        result = {'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'stages': self.stages, 'counters': self.counters}
+        if target != "-":
+            with open(target, "w") as fp:
+                json.dump(result, fp, indent=2)
+            return
+        print(f"\n{'stage':20} {'wall s':>9} {'cpu s':>9} {'peak kB':>9} " + " ".join(f"{key:>{len(key)}}" for key in profile_counter_names))
+        for stage in self.stages:
+            print(f"{stage['stage']:20} {stage['wall_s']:9.3f} {stage['cpu_s']:9.3f} {stage['peak_rss_kb'] or 0:9} "
+                  + " ".join(f"{stage['counters'][key]:{len(key)}}" for key in profile_counter_names))
+
+
+def peak_rss_kb():
+    # Peak resident memory of process so far, None when platform cannot tell it
+    try:
+        import resource
+    except ImportError:     # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# Shared by all stages, enabled with --profile
+profiler = Profiler()
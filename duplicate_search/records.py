@@ -0,0 +1,133 @@
+import sys
+from array import array
+
+
+class RecordStore:
+    """
+    Records of one search as parallel arrays, record index is the position in the arrays.
+    Title and description strings are interned so texts of repeated programmes are stored once.
+    Duplicate groups are integer ids. Members of all groups are in one array, group_start tells where each group begins.
+    With text_folder texts are kept in a temporary file of that folder and only their file positions in memory.
+    """
+    def __init__(self, text_folder=None):
+        self.filenames = []
+        self.titles = []            # Line 2 of meta file, None when meta file was not read
+        self.descriptions = []      # Line 3 of meta file, None when meta file was not read
+        self.text_file = None
+        if text_folder is not None:
+            import tempfile
+            # Removed by the system when closed, also after crash
+            self.text_file = tempfile.TemporaryFile(mode="w+b", dir=text_folder)
+            self.text_offsets = array('q')  # Position of texts in text file, -1 when meta file was not read
+            self.text_size = 0
+            self.text_file_at_end = True     # Writing continues without seek until texts are read
+        self.root_ids = array('H')          # Recording directory of record
+        self.file_sizes = array('q')        # .ts file size, -1 when not known
+        self.group_ids = array('l')         # Duplicate group of record, -1 when record has no duplicates
+        self.group_members = array('l')     # Record indexes of groups, kept record is last in its group
+        self.group_start = array('l', [0])
+        self.removed = bytearray()
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def add(self, filename, title=None, description=None, root_id=0):
+        """
+        Add record
+        :param filename: Name of .ts.meta file
+        :param title: Title line, None when meta file was not read
+        :param description: Description line, None when meta file was not read
+        :param root_id: Position of recording directory
+        :return: Index of the record
+        """
+        self.filenames.append(filename)
+        self.root_ids.append(root_id)
+        if self.text_file is not None:
+            if title is None:
+                self.text_offsets.append(-1)
+            else:
+                self.text_offsets.append(self.text_size)
+                if not self.text_file_at_end:
+                    self.text_file.seek(self.text_size)
+                    self.text_file_at_end = True
+                self.text_size += self.text_file.write(f"{title}\0{description}\n".encode("utf-8", "surrogateescape"))
+        else:
+            self.titles.append(sys.intern(title) if title is not None else None)
+            self.descriptions.append(sys.intern(description) if description is not None else None)
+        self.file_sizes.append(-1)
+        self.group_ids.append(-1)
+        self.removed.append(0)
+        return len(self.filenames) - 1
+
+    def stored_texts(self, index):
+        """
+        Title and description of record
+        :param index: Record index
+        :return: Tuple (title, description), (None, None) when meta file was not read
+        """
+        if self.text_file is None:
+            return self.titles[index], self.descriptions[index]
+        if self.text_offsets[index] < 0:
+            return None, None
+        self.text_file.seek(self.text_offsets[index])
+        self.text_file_at_end = False
+        title, description = self.text_file.readline().decode("utf-8", "surrogateescape").rstrip("\n").split("\0", 1)
+        return title, description
+
+    def texts(self, index):
+        # Title and description used in comparison, records without meta data have empty texts
+        title, description = self.stored_texts(index)
+        return title or "", description or ""
+
+    def close(self):
+        if self.text_file is not None:
+            self.text_file.close()
+            self.text_file = None
+
+    def add_group(self, members):
+        """
+        Add duplicate group
+        :param members: Record indexes, kept record last
+        :return: Group id
+        """
+        group_id = len(self.group_start) - 1
+        for index in members:
+            if self.group_ids[index] != -1:
+                print(f"Internal error record {index} is already in group {self.group(self.group_ids[index])}")
+            self.group_ids[index] = group_id
+            self.group_members.append(index)
+        self.group_start.append(len(self.group_members))
+        return group_id
+
+    def group_count(self):
+        return len(self.group_start) - 1
+
+    def group(self, group_id):
+        # Record indexes of group, kept record last
+        return self.group_members[self.group_start[group_id]:self.group_start[group_id+1]].tolist()
+
+    def groups(self):
+        for group_id in range(self.group_count()):
+            yield self.group(group_id)
+
+    def log_rows(self, similarity=None):
+        """
+        Log rows of records in index order
+        :param similarity: Optional function (index, kept index) giving similarity of record to kept record
+        :return: Generator of dicts with log field names as keys
+        """
+        for index, filename in enumerate(self.filenames):
+            row = {'filename': filename, 'index': index, 'result': bool(self.removed[index])}
+            title, description = self.stored_texts(index)
+            if title is not None:
+                row['line2'] = title
+                row['line3'] = description
+            group_id = self.group_ids[index]
+            if group_id != -1:
+                members = self.group(group_id)
+                if self.file_sizes[index] >= 0:
+                    row['file_size'] = self.file_sizes[index]
+                row['dupl_inx'] = ("+ " if index == members[-1] else "- ") + str(members)
+                if similarity is not None:
+                    row['similarity'] = f"{similarity(index, members[-1]):.2f}"
+            yield row
@@ -0,0 +1,137 @@
+import os
+import time
+import itertools
+
+from .fileio import map_io
+from .profiling import profiler
+
+removal_journal_name = "duplicate_removal_journal.jsonl"
+removal_batch_size = 64
+run_counter = itertools.count()
+
+
+def new_run_id():
+    # Unique also when one process runs several searches in the same second
+    return time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}-{next(run_counter)}"
+
+
+class RemovalExecutor:
+    """
+    Removes or moves to trash all files of duplicate records. Files of a record are the files starting with
+    record name and a dot, for example .ts, .ts.meta, .ts.ap, .ts.sc, .ts.cuts and .eit.
+    Each folder is listed once. Every batch is written to journal before files are touched.
+    """
+    def __init__(self, journal_filename, trash_folder=None, workers=1):
+        self.journal_filename = journal_filename
+        self.trash_folder = trash_folder
+        self.workers = workers
+        self.folders = {}
+        self.run_id = new_run_id()
+
+    def start_run(self, run_id):
+        # Folder listings of earlier run can miss new recordings
+        self.folders = {}
+        self.run_id = run_id
+
+    def _folder_index(self, folder):
+        # Maps every name prefix ending before a dot to files in folder
+        index = self.folders.get(folder)
+        if index is None:
+            index = {}
+            profiler.count('directory_listings')
+            with os.scandir(folder if folder != "" else ".") as it:
+                for entry in it:
+                    if entry.is_dir():
+                        continue
+                    position = entry.name.find(".", 1)
+                    while position > 0:
+                        index.setdefault(entry.name[:position], []).append(entry.name)
+                        position = entry.name.find(".", position + 1)
+            self.folders[folder] = index
+        return index
+
+    def sibling_files(self, record_name):
+        """
+        Files belonging to one record
+        :param record_name: Record filename without .ts.meta extension
+        :return: List of filenames
+        """
+        folder, base = os.path.split(record_name)
+        return [os.path.join(folder, name) for name in self._folder_index(folder).get(base, [])]
+
+    def _write_journal(self, entry):
+        import json
+        with open(self.journal_filename, "a") as fp:
+            fp.write(json.dumps(entry) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def _remove_file(self, f):
+        # Returns f when file is gone after the call, None on error
+        try:
+            if self.trash_folder is not None:
+                target = os.path.join(self.trash_folder, os.path.basename(f))
+                profiler.count('stat_calls')
+                if os.path.exists(target):
+                    print(f"Not moved, {target} exists already")
+                    return None
+                profiler.count('files_moved')
+                os.rename(f, target)
+            else:
+                profiler.count('files_unlinked')
+                os.remove(f)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            print(f"Cannot remove {f}, {error}")
+            return None
+        return f
+
+    def remove_files(self, files, run_id=None):
+        """
+        Remove files in batches. Journal tells which files were planned and which were removed.
+        :param files: List of filenames
+        :param run_id: Journal run id, by default id of this run
+        :return: List of removed files
+        """
+        run_id = run_id if run_id is not None else self.run_id
+        if self.trash_folder is not None:
+            os.makedirs(self.trash_folder, exist_ok=True)
+        removed_files = []
+        for start in range(0, len(files), removal_batch_size):
+            batch = files[start:start+removal_batch_size]
+            self._write_journal({'run': run_id, 'planned': batch})
+            removed = [f for f in map_io(self._remove_file, batch, self.workers) if f is not None]
+            self._write_journal({'run': run_id, 'removed': removed})
+            removed_files.extend(removed)
+        self._write_journal({'run': run_id, 'done': True})
+        return removed_files
+
+    def resume(self):
+        """
+        Finish removals of interrupted runs found from journal
+        :return: List of removed files
+        """
+        import json
+        planned = {}
+        try:
+            with open(self.journal_filename) as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue    # Last line could be partial after crash
+                    files = planned.setdefault(entry['run'], {})
+                    for f in entry.get('planned', []):
+                        files[f] = True
+                    for f in entry.get('removed', []):
+                        files.pop(f, None)
+                    if entry.get('done'):
+                        del planned[entry['run']]
+        except FileNotFoundError:
+            return []
+        removed_files = []
+        for run_id, files in planned.items():
+            print(f"Resumes removal of run {run_id}, {len(files)} files")
+            removed_files.extend(self.remove_files(list(files), run_id))
+        return removed_files
@@ -0,0 +1,113 @@
+import os
+
+from .profiling import profiler
+
+
+def is_prunable_pattern(pattern_text):
+    """
+    Check if skip pattern matching a directory path also matches every file below it.
+    Patterns looking at end of the path could match directory but not its files.
+    :param pattern_text: Regex pattern from skipped_titles
+    :return: True when directory can be skipped without listing it
+    """
+    for token in ("$", "\\Z", "\\B", "(?=", "(?!"):
+        if token in pattern_text:
+            return False
+    return True
+
+
+def walk_folder(folder, prune_patterns=(), pruned_dirs=None):
+    """
+    Search all files in given folder and below it with os.scandir
+    :param folder: Name of folder to look files
+    :param prune_patterns: Compiled patterns, folder is not listed when one matches folder name with trailing /
+    :param pruned_dirs: Optional list where (folder name, pattern) of skipped folders are appended
+    :return: Generator of (filename, DirEntry) tuples
+    """
+    for pattern in prune_patterns:
+        if pattern.search(folder + "/"):
+            if pruned_dirs is not None:
+                pruned_dirs.append((folder + "/", pattern.pattern))
+            return
+    try:
+        profiler.count('directory_listings')
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_dir():
+                    yield from walk_folder(entry.path, prune_patterns, pruned_dirs)
+                else:
+                    yield entry.path, entry
+    except OSError as error:
+        print(f"Folder {folder} cannot be read, {error}")
+
+
+def walk_recordings(movie_root, include_subfolders=True, prune_patterns=(), pruned_dirs=None):
+    """
+    Search files of recording directory. Every file is given exactly once.
+    Files of top folder are named relative to it, files in subfolders have movie_root as prefix.
+    :param movie_root: Recording directory
+    :param include_subfolders: Optionally skip subfolder search
+    :param prune_patterns: Compiled patterns for folders that are not listed
+    :param pruned_dirs: Optional list where (folder name, pattern) of skipped folders are appended
+    :return: Generator of (filename, DirEntry) tuples
+    """
+    sub_dirs = []
+    profiler.count('directory_listings')
+    with os.scandir(movie_root) as it:
+        for entry in it:
+            if entry.is_dir():
+                sub_dirs.append(entry.name)
+            else:
+                yield entry.name, entry
+    if include_subfolders:
+        for name in sub_dirs:
+            yield from walk_folder(movie_root + "/" + name, prune_patterns, pruned_dirs)
+
+
+class PathFilter:
+    """
+    Selection of files by files_searched and skipped_titles patterns. Patterns are compiled once and each name is checked once.
+    """
+    def __init__(self, must_have_patterns, skip_patterns):
+        import re
+        self.must_have_patterns = [re.compile(p) for p in must_have_patterns]
+        self.skip_patterns = [re.compile(p) for p in skip_patterns]
+        self.prune_patterns = [p for p in self.skip_patterns if is_prunable_pattern(p.pattern)]
+
+    def skip_reason(self, name):
+        """
+        Check one filename against patterns
+        :param name: Filename
+        :return: None when file is selected, matching skip pattern when skipped, "" when no files_searched pattern matches
+        """
+        if self.must_have_patterns and not any(p.search(name) for p in self.must_have_patterns):
+            return ""
+        for p in self.skip_patterns:
+            if p.search(name):
+                return p.pattern
+        return None
+
+    def iter_select(self, names, files_skipped):
+        """
+        Filter filenames as they arrive
+        :param names: Iterable of filenames
+        :param files_skipped: List where (filename, pattern) of files removed by skip pattern are appended
+        :return: Generator of selected filenames in given order
+        """
+        for name in names:
+            reason = self.skip_reason(name)
+            if reason is None:
+                yield name
+            elif reason != "":
+                files_skipped.append((name, reason))
+
+    def select(self, names, files_skipped):
+        # List version of iter_select
+        return list(self.iter_select(names, files_skipped))
+
+
+def print_process_errors(stream):
+    # Error output of file list process is shown but it does not stop processing
+    for line in stream:
+        print(f"Errors found: {line.rstrip()}")
+    stream.close()
@@ -0,0 +1,81 @@
+import zlib
+import tempfile
+
+from .grouping import DuplicateIndex
+
+spill_partitions = 64       # Partition files of one level
+spill_max_depth = 3         # Levels of splitting before a partition is grouped regardless of its size
+spill_memory_factor = 4     # Estimated memory use of grouping compared to size of partition file
+
+
+class SpillDuplicateIndex:
+    """
+    Groups records by (title line, description line) like DuplicateIndex, but keys are written to temporary
+    partition files chosen by hash of the key. Equal keys are always in same partition so partitions are grouped
+    one at a time. Partition that would not fit to memory limit is split again with other hash.
+    Records must be added in index order, result is the same as with DuplicateIndex.
+    """
+    def __init__(self, use_empty_epg_description=False, memory_limit=32*1024*1024, folder=None):
+        self.use_empty_epg_description = use_empty_epg_description
+        self.memory_limit = memory_limit
+        self.folder = folder
+        self.files = self._new_partitions()
+
+    def _new_partitions(self):
+        # Temporary files are removed by the system when closed, also after crash
+        return [tempfile.TemporaryFile(mode="w+b", dir=self.folder) for i in range(spill_partitions)]
+
+    @staticmethod
+    def _partition(line2, line3, level):
+        key = f"{level}\0{line2}\0{line3}".encode("utf-8", "surrogateescape")
+        return zlib.crc32(key) % spill_partitions
+
+    @staticmethod
+    def _row(index, line2, line3):
+        # Meta lines are stripped so they do not contain newlines, zero character separates the fields
+        return f"{index}\0{line2}\0{line3}\n".encode("utf-8", "surrogateescape")
+
+    def add(self, index, line2, line3):
+        # Record without description is not compared unless allowed by configuration
+        if not self.use_empty_epg_description and line3 == "":
+            return
+        self.files[self._partition(line2, line3, 0)].write(self._row(index, line2, line3))
+
+    @staticmethod
+    def _rows(partition_file):
+        partition_file.seek(0)
+        for line in partition_file:
+            index, line2, line3 = line.decode("utf-8", "surrogateescape").rstrip("\n").split("\0", 2)
+            yield int(index), line2, line3
+
+    def _group_partition(self, partition_file, level, groups):
+        size = partition_file.tell()
+        if size * spill_memory_factor > self.memory_limit and level < spill_max_depth:
+            # Too big for memory limit, split to smaller partitions
+            sub_files = self._new_partitions()
+            for index, line2, line3 in self._rows(partition_file):
+                sub_files[self._partition(line2, line3, level + 1)].write(self._row(index, line2, line3))
+            partition_file.close()
+            for sub_file in sub_files:
+                self._group_partition(sub_file, level + 1, groups)
+            return
+        duplicate_index = DuplicateIndex(True)
+        for index, line2, line3 in self._rows(partition_file):
+            duplicate_index.add(index, line2, line3)
+        partition_file.close()
+        groups.extend(duplicate_index.duplicate_groups())
+
+    def duplicate_groups(self):
+        # Groups are ordered by their first index like in DuplicateIndex
+        groups = []
+        for partition_file in self.files:
+            partition_file.seek(0, 2)
+            self._group_partition(partition_file, 0, groups)
+        self.files = []
+        groups.sort(key=lambda group: group[0])
+        return groups
+
+    def close(self):
+        for partition_file in self.files:
+            partition_file.close()
+        self.files = []
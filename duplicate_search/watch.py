@@ -0,0 +1,371 @@
+import os
+import time
+import struct
+from collections import deque
+
+from .fileio import string_without_extension
+from .grouping import order_keeper_last
+
+# inotify constants from <sys/inotify.h>
+in_close_write = 0x00000008
+in_moved_from = 0x00000040
+in_moved_to = 0x00000080
+in_create = 0x00000100
+in_delete = 0x00000200
+in_q_overflow = 0x00004000
+in_ignored = 0x00008000
+in_isdir = 0x40000000
+in_cloexec = 0o2000000
+inotify_mask = in_close_write | in_moved_from | in_moved_to | in_create | in_delete
+inotify_event_header = struct.Struct("iIII")
+
+
+class InotifySource:
+    """
+    File events of watched folders from Linux inotify. inotify is not recursive so each folder has own watch.
+    """
+    def __init__(self):
+        import ctypes
+        self.ctypes = ctypes
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(in_cloexec)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify cannot be started")
+        self.folders = {}   # watch descriptor -> folder
+
+    def add_folder(self, folder):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), inotify_mask)
+        if wd < 0:
+            print(f"Folder {folder} cannot be watched, {os.strerror(self.ctypes.get_errno())}")
+            return
+        self.folders[wd] = folder
+
+    def wait(self, timeout):
+        """
+        Wait for events
+        :param timeout: Seconds to wait, None waits until there is an event
+        :return: List of (path, kind), kind is "changed", "deleted", "folder" or "overflow"
+        """
+        import select
+        readable, writable, failed = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = inotify_event_header.unpack_from(data, offset)
+            offset += inotify_event_header.size
+            name = os.fsdecode(data[offset:offset+length].rstrip(b"\0"))
+            offset += length
+            if mask & in_q_overflow:
+                events.append((None, "overflow"))
+                continue
+            folder = self.folders.get(wd)
+            if folder is None:
+                continue
+            if mask & in_ignored:
+                del self.folders[wd]    # Folder was removed
+                continue
+            path = os.path.join(folder, name)
+            if mask & in_isdir:
+                if mask & (in_create | in_moved_to):
+                    events.append((path, "folder"))
+            elif mask & (in_delete | in_moved_from):
+                events.append((path, "deleted"))
+            else:
+                events.append((path, "changed"))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """
+    File events by listing watched folders periodically. Works also on network mounts where inotify does not
+    see changes done by other hosts.
+    Only names of listings are compared, files are stat'ed only when they are new or pending so a poll
+    does not stat the whole disk.
+    """
+    def __init__(self, list_files, poll_seconds, pending):
+        self.list_files = list_files    # Function returning set of paths
+        self.poll_seconds = poll_seconds
+        self.pending = pending          # Paths waiting for check, their changes are followed
+        self.snapshot = list_files()
+        self.states = {}                # Path -> (mtime, size) of new and pending files
+        self.next_poll = time.monotonic() + poll_seconds
+
+    def _changed(self, path):
+        try:
+            stat = os.stat(path)
+            state = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            state = None
+        changed = self.states.get(path) != state
+        self.states[path] = state
+        return changed
+
+    def add_folder(self, folder):
+        pass    # All folders are listed on every poll
+
+    def wait(self, timeout):
+        delay = self.next_poll - time.monotonic()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(delay, 0))
+        self.next_poll = time.monotonic() + self.poll_seconds
+        snapshot = self.list_files()
+        new_paths = snapshot - self.snapshot
+        for path in new_paths:
+            self._changed(path)
+        events = [(path, "changed") for path in new_paths]
+        events.extend((path, "changed") for path in self.pending if path in snapshot and path not in new_paths
+                      and self._changed(path))
+        events.extend((path, "deleted") for path in self.snapshot - snapshot)
+        self.snapshot = snapshot
+        # States of checked files are not needed any more
+        for path in [path for path in self.states if path not in self.pending and path not in new_paths]:
+            del self.states[path]
+        return events
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """
+    Keeps running after the first full search and checks recordings when they are finished.
+    Meta file events start the check, it is done when events have stopped and .ts file has not grown for debounce time.
+    Only the key of that recording is compared, against in-memory index built from the full search.
+    """
+    def __init__(self, finder):
+        self.finder = finder
+        self.config = finder.config
+        self.movie_folder = finder.root_folders[0]
+        self.keys = {}          # (title, description) -> names of records
+        self.record_keys = {}   # Record name -> (title, description)
+        self.pending = {}       # Meta file path -> [time of last event, .ts size, time when size was seen first]
+        self.deletions = deque()    # Times of removed records
+
+    def load(self, records):
+        """
+        Build index from records of full search
+        :param records: RecordStore of DuplicateFinder
+        """
+        for index, name in enumerate(records.filenames):
+            if records.removed[index] and self.config.removal_enabled:
+                continue
+            self._add(name, records.texts(index))
+
+    def _add(self, name, key):
+        if not self.config.use_empty_epg_description and key[1] == "":
+            return
+        self.keys.setdefault(key, []).append(name)
+        self.record_keys[name] = key
+
+    def _forget(self, name):
+        key = self.record_keys.pop(name, None)
+        if key is not None:
+            names = self.keys[key]
+            names.remove(name)
+            if not names:
+                del self.keys[key]
+
+    def _record_name(self, path):
+        # Same name as in full search: top folder files are relative, others have movie root as prefix
+        if self.finder.absolute_names:
+            return path
+        folder, name = os.path.split(path)
+        if folder == self.movie_folder:
+            return name
+        return self.movie_folder + "/" + os.path.relpath(path, self.movie_folder)
+
+    def _folders(self):
+        # Watched folders, folders matching skip patterns are left out
+        if not self.config.include_subfolders:
+            return list(self.finder.root_folders)
+        folders = []
+        for root_folder in self.finder.root_folders:
+            for folder, dirnames, filenames in os.walk(root_folder):
+                folders.append(folder)
+                dirnames[:] = [d for d in dirnames if not any(p.search(self._record_name(os.path.join(folder, d)) + "/")
+                                                             for p in self.finder.path_filter.prune_patterns)]
+        return folders
+
+    def _list_files(self):
+        # Selected files of watched folders, only names so listing does not stat files
+        files = set()
+        for folder in self._folders():
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if not entry.is_dir() and self.finder.path_filter.skip_reason(self._record_name(entry.path)) is None:
+                            files.add(entry.path)
+            except OSError as error:
+                print(f"Folder {folder} cannot be read, {error}")
+        return files
+
+    def _open_source(self):
+        if not self.config.watch_use_polling:
+            try:
+                source = InotifySource()
+                for folder in self._folders():
+                    source.add_folder(folder)
+                return source
+            except (OSError, AttributeError) as error:
+                print(f"inotify is not available, {error}. Folders are polled.")
+        return PollingSource(self._list_files, self.config.watch_poll_seconds, self.pending)
+
+    @staticmethod
+    def _ts_size(path):
+        # Current size, meta index and directory listing of full search can have old size of growing file
+        try:
+            return os.stat(string_without_extension(path) + ".ts").st_size
+        except FileNotFoundError:
+            return None
+
+    def _handle_event(self, source, path, kind):
+        now = time.monotonic()
+        if kind == "overflow":
+            # Events were lost, all files are checked again
+            print("Watch events were lost, all recordings are checked")
+            for path in self._list_files():
+                self.pending[path] = [now, self._ts_size(path), now]
+        elif kind == "folder":
+            for folder, dirnames, filenames in os.walk(path):
+                source.add_folder(folder)
+                for filename in filenames:
+                    self._handle_event(source, os.path.join(folder, filename), "changed")
+        elif self.finder.path_filter.skip_reason(self._record_name(path)) is not None:
+            return
+        elif kind == "deleted":
+            self.pending.pop(path, None)
+            self._forget(self._record_name(path))
+        elif path in self.pending:
+            self.pending[path][0] = now
+        else:
+            self.pending[path] = [now, self._ts_size(path), now]
+
+    def _is_ready(self, path, now):
+        # .ts file has stopped growing
+        state = self.pending[path]
+        debounce = self.config.watch_debounce_seconds
+        if now - state[0] < debounce:
+            return False
+        size = self._ts_size(path)
+        if size != state[1]:
+            state[1] = size
+            state[2] = now
+            return False
+        return now - state[2] >= debounce
+
+    def _deletions_allowed(self, now):
+        limit = self.config.watch_max_deletions_per_hour
+        if limit <= 0:
+            return None
+        while self.deletions and now - self.deletions[0] >= 3600:
+            self.deletions.popleft()
+        return limit - len(self.deletions)
+
+    def _check(self, path, now):
+        """
+        Check one finished recording against the index
+        :return: True when check is done, False when it must be tried again later
+        """
+        config = self.config
+        finder = self.finder
+        name = self._record_name(path)
+        try:
+            lines = finder._read_meta_if_named(name)
+        except FileNotFoundError:
+            return True
+        key = lines if lines is not None else ("", "")
+        self._forget(name)
+        self._add(name, key)
+        if name not in self.record_keys:
+            return True
+        members = sorted(self.keys[key])
+        if config.fingerprint_verification and len(members) > 1:
+            fingerprint = finder._fingerprint(name)
+            members = [m for m in members if m == name or (fingerprint is not None and finder._fingerprint(m) == fingerprint)]
+        if len(members) < 2:
+            return True
+        sizes = [self._ts_size(m) or 0 for m in members]
+        preferences = None
+        if finder.absolute_names:
+            preferences = [finder.root_preferences[finder.root_id_of(m)] for m in members]
+        ordered = order_keeper_last(members, sizes, config.file_size_factor, preferences)
+        keeper = ordered[-1]
+        records_to_remove = ordered[:-1]
+        done = True
+        if config.removal_enabled:
+            allowed = self._deletions_allowed(now)
+            if allowed is not None and allowed < len(records_to_remove):
+                print(f"Deletion limit {config.watch_max_deletions_per_hour} per hour reached, {name} is checked later")
+                records_to_remove = records_to_remove[:max(allowed, 0)]
+                done = False
+        history = finder.history
+        if history is not None:
+            history.write("keep", keeper, f"kept copy of {len(members)} found in watch mode", title=key[0])
+        for rec in records_to_remove:
+            if config.verbose or config.print_duplicates:
+                print(string_without_extension(rec))
+            # Folder listing of executor is taken again so files of new recordings are found
+            removal_executor = finder.removal_executor_of(rec)
+            removal_executor.folders.pop(os.path.dirname(rec), None)
+            files = removal_executor.sibling_files(string_without_extension(rec))
+            if not config.removal_enabled:
+                if history is not None:
+                    history.write("suggest", rec, f"duplicate of {keeper}", title=key[0], keeper=keeper)
+                if config.verbose:
+                    for f in files:
+                        print(f"Would remove: {f}")
+                continue
+            removed_files = removal_executor.remove_files(files)
+            for f in removed_files:
+                if config.verbose:
+                    print(f"Removes: {f}")
+            if history is not None:
+                from .history import removal_result
+                action, reason = removal_result(rec, files, removed_files, keeper)
+                history.write(action, rec, reason, title=key[0], keeper=keeper)
+            self._forget(rec)
+            self.deletions.append(now)
+        return done
+
+    def _process_pending(self):
+        now = time.monotonic()
+        for path in [path for path in self.pending if self._is_ready(path, now)]:
+            if self._check(path, now):
+                del self.pending[path]
+            else:
+                # Deletion limit is reached, tried again when the oldest deletion is one hour old
+                self.pending[path][0] = self.deletions[0] + 3600 - self.config.watch_debounce_seconds
+
+    def run(self):
+        # Runs until interrupted
+        if self.config.watch_niceness > 0:
+            try:
+                os.nice(self.config.watch_niceness)
+            except (AttributeError, OSError) as error:
+                print(f"Niceness cannot be set, {error}")
+        with self.finder._in_movie_folder():
+            source = self._open_source()
+            if self.config.verbose:
+                print(f"Watching {', '.join(self.finder.root_folders)} with {type(source).__name__}, {len(self.record_keys)} records in index")
+            try:
+                while True:
+                    timeout = self.config.watch_debounce_seconds if self.pending else None
+                    for path, kind in source.wait(timeout):
+                        self._handle_event(source, path, kind)
+                    self._process_pending()
+            except KeyboardInterrupt:
+                print("Watch stopped")
+            finally:
+                source.close()
+                if self.finder.meta_index is not None:
+                    self.finder.meta_index.save()
+                if self.finder.history is not None:
+                    self.finder.history.close()